@@ -1,8 +1,12 @@
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import json
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import scoped_session, sessionmaker
+from datetime import datetime
+import base64
+import time
+
+import orjson
 
 import config
 from models import STIXObject, Collection
@@ -10,8 +14,14 @@ from models import STIXObject, Collection
 app = Flask(__name__)
 CORS(app)
 
-engine = create_engine(config.SQLALCHEMY_DATABASE_URI, echo=config.SQLALCHEMY_ECHO)
-Session = sessionmaker(bind=engine)
+engine = config.get_engine()
+# one session per request context, released in teardown below
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+
+@app.teardown_appcontext
+def remove_session(exc=None):
+    Session.remove()
 
 
 @app.route("/taxii/", methods=["GET"])
@@ -25,45 +35,113 @@ def api_root():
     return jsonify(data)
 
 
+# collections are created administratively and rarely change, so the
+# serialized listing is kept in-process for COLLECTIONS_CACHE_SECONDS
+_collections_cache = {"ts": 0.0, "body": None}
+
+
 @app.route("/taxii/collections", methods=["GET"])
 def list_collections():
+    now = time.monotonic()
+    if _collections_cache["body"] is not None and now - _collections_cache["ts"] < config.COLLECTIONS_CACHE_SECONDS:
+        return Response(_collections_cache["body"], mimetype="application/json")
+
     session = Session()
     cols = session.query(Collection).all()
     out = []
     for c in cols:
         out.append({"id": c.id, "title": c.title, "description": c.description})
-    return jsonify({"collections": out})
+
+    body = orjson.dumps({"collections": out})
+    _collections_cache.update(ts=now, body=body)
+    return Response(body, mimetype="application/json")
+
+
+def encode_cursor(created_at, obj_id):
+    """Encode the (created_at, id) of the last row served as an opaque page cursor."""
+    raw = f"{created_at.isoformat()}|{obj_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        ts, obj_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(ts), int(obj_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {e}") from e
 
 
 @app.route("/taxii/collections/<collection_id>/objects", methods=["GET"])
 def collection_objects(collection_id):
-    """Return a STIX bundle for objects in a collection. Supports pagination via ?limit=&offset="""
-    limit = int(request.args.get("limit", 50))
-    offset = int(request.args.get("offset", 0))
+    """Return a STIX bundle for objects in a collection.
+
+    Supports keyset pagination via ?limit=&cursor= (pass back the `next_cursor`
+    of the previous page). Set ?include_total=1 to also get the collection size.
+    """
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    limit = min(limit, config.MAX_PAGE_SIZE)
+    cursor = request.args.get("cursor")
+    include_total = request.args.get("include_total") in ("1", "true")
 
     session = Session()
 
     # ensure collection exists
-    coll = session.query(Collection).filter_by(id=collection_id).first()
+    coll = session.get(Collection, collection_id)
     if not coll:
         return jsonify({"error": "collection not found"}), 404
 
-    q = session.query(STIXObject).filter_by(collection_id=collection_id).order_by(STIXObject.created_at.desc())
-    total = q.count()
-    objs = q.offset(offset).limit(limit).all()
-
-    stix_objects = [json.loads(o.raw) for o in objs]
-
-    bundle = {
-        "type": "bundle",
-        "id": f"bundle--{collection_id}",
-        "objects": stix_objects,
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-    }
-
-    return Response(json.dumps(bundle, ensure_ascii=False), mimetype="application/vnd.oasis.stix+json; version=2.1")
+    where = [STIXObject.collection_id == collection_id]
+    # counting is a separate scan of the collection, so only do it on request
+    total = None
+    if include_total:
+        total = session.scalar(select(func.count()).select_from(STIXObject).where(*where))
+
+    if cursor:
+        try:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        where.append(tuple_(STIXObject.created_at, STIXObject.id) < (cursor_ts, cursor_id))
+
+    # plain Core rows (no ORM instances / identity map), fetched from a
+    # server-side cursor so memory stays flat regardless of `limit`
+    stmt = (
+        select(STIXObject.raw, STIXObject.created_at, STIXObject.id)
+        .where(*where)
+        .order_by(STIXObject.created_at.desc(), STIXObject.id.desc())
+        .limit(limit)
+        .execution_options(stream_results=True, yield_per=200)
+    )
+
+    def generate():
+        # stored raw values are already serialized STIX JSON bytes, so they are
+        # written through verbatim instead of being parsed and re-encoded
+        yield b'{"type":"bundle","id":' + orjson.dumps(f"bundle--{collection_id}") + b',"objects":['
+        served = 0
+        last_ts = last_id = None
+        for raw, last_ts, last_id in session.execute(stmt):
+            if served:
+                yield b","
+            yield raw
+            served += 1
+
+        next_cursor = None
+        if served == limit and last_id is not None:
+            next_cursor = encode_cursor(last_ts, last_id)
+
+        trailer = {"limit": limit, "next_cursor": next_cursor}
+        if include_total:
+            trailer["total"] = total
+        yield b"]," + orjson.dumps(trailer)[1:]
+
+    # keep the app context (and so the scoped session) alive while streaming
+    return Response(stream_with_context(generate()), mimetype="application/vnd.oasis.stix+json; version=2.1")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ Edit values here to change defaults, or set env vars for production.
 """
 import os
 
+from sqlalchemy import create_engine
+
 MYSQL_USER = os.getenv("MYSQL_USER", "taxii_user")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "taxii_pass")
 MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
@@ -17,3 +19,30 @@ SQLALCHEMY_DATABASE_URI = (
 
 # For small deployments
 SQLALCHEMY_ECHO = False
+
+# How long GET /taxii/collections serves its cached listing (seconds)
+COLLECTIONS_CACHE_SECONDS = int(os.getenv("COLLECTIONS_CACHE_SECONDS", "60"))
+
+# Largest ?limit= accepted by the objects endpoint; bigger values are clamped
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Connection pool sizing for the Flask process
+SQLALCHEMY_POOL_SIZE = int(os.getenv("SQLALCHEMY_POOL_SIZE", "10"))
+SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", "20"))
+SQLALCHEMY_POOL_RECYCLE = 1800  # seconds; stay under MySQL's wait_timeout
+
+# Rows per multi-VALUES INSERT when executing bulk inserts
+SQLALCHEMY_INSERT_PAGE_SIZE = 10_000
+
+
+def get_engine():
+    """Create the SQLAlchemy engine shared by the server and the ingest scripts."""
+    return create_engine(
+        SQLALCHEMY_DATABASE_URI,
+        echo=SQLALCHEMY_ECHO,
+        pool_size=SQLALCHEMY_POOL_SIZE,
+        max_overflow=SQLALCHEMY_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=SQLALCHEMY_POOL_RECYCLE,
+        insertmanyvalues_page_size=SQLALCHEMY_INSERT_PAGE_SIZE,
+    )
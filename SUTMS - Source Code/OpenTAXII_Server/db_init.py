@@ -1,18 +1,17 @@
 """Create DB tables and a default collection."""
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models import Base, Collection
 import config
 
 
 def init_db():
-    engine = create_engine(config.SQLALCHEMY_DATABASE_URI, echo=config.SQLALCHEMY_ECHO)
+    engine = config.get_engine()
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     session = Session()
 
     # ensure a default collection exists
-    qc = session.query(Collection).filter_by(id="default_collection").first()
+    qc = session.get(Collection, "default_collection")
     if not qc:
         default = Collection(
             id="default_collection",
@@ -9,27 +9,53 @@ python ingest_feeds.py --count 1000
 python ingest_feeds.py --count 500 --collection demo_collection
 
 # tune batch commit size
-python ingest_feeds.py --count 2000 --batch 500
+python ingest_feeds.py --count 200000 --batch 5000
+
+# limit the number of generator processes
+python ingest_feeds.py --count 1000000 --workers 4
 
 This script does not require Docker to run (but DB must be available per `config.py`).
 """
 import argparse
-import json
+import os
 import random
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
 
-from sqlalchemy import create_engine
+import orjson
 from sqlalchemy.orm import sessionmaker
 
 import config
 from models import STIXObject, Collection
 
 
-def make_indicator(i: int):
+# Pre-serialized STIX templates. Only ids, timestamps and names vary between
+# demo objects, so rows are rendered straight to JSON instead of building a
+# dict per object and encoding it. Values that may need escaping go through
+# orjson; ids, timestamps and the fixed demo names are plain ASCII.
+INDICATOR_TMPL = (
+    '{"type":"indicator","id":"%s","created":"%s","modified":"%s","name":%s,'
+    '"pattern":%s,"pattern_type":"stix","valid_from":"%s"}'
+)
+MALWARE_TMPL = (
+    '{"type":"malware","id":"%s","created":"%s","modified":"%s",'
+    '"name":"DemoMalware-%d","is_family":false}'
+)
+ATTACK_PATTERN_TMPL = (
+    '{"type":"attack-pattern","id":"%s","created":"%s","modified":"%s",'
+    '"name":"Example Attack Pattern %d"}'
+)
+
+
+def _json_str(value: str) -> str:
+    return orjson.dumps(value).decode()
+
+
+def make_indicator(i: int, now_iso: str):
     # choose pattern type randomly
     kind = random.choice(["ipv4", "domain", "file_hash", "url"])
-    uid = str(uuid.uuid4())
     if kind == "ipv4":
         octet = (i % 250) + 1
         pattern = f"[ipv4-addr:value = '198.51.100.{octet}']"
@@ -46,54 +72,46 @@ def make_indicator(i: int):
         pattern = f"[url:value = 'http://malicious.example.com/{i}']"
         title = f"Malicious URL http://malicious.example.com/{i}"
 
-    return {
-        "type": "indicator",
-        "id": f"indicator--{uid}",
-        "created": datetime.now(timezone.utc).isoformat(),
-        "modified": datetime.now(timezone.utc).isoformat(),
-        "name": title,
-        "pattern": pattern,
-        "pattern_type": "stix",
-        "valid_from": datetime.now(timezone.utc).isoformat(),
-    }
+    object_id = f"indicator--{uuid.uuid4()}"
+    raw = INDICATOR_TMPL % (object_id, now_iso, now_iso, _json_str(title), _json_str(pattern), now_iso)
+    return object_id, raw
 
 
-def make_malware(i: int):
-    uid = str(uuid.uuid4())
-    return {
-        "type": "malware",
-        "id": f"malware--{uid}",
-        "created": datetime.now(timezone.utc).isoformat(),
-        "modified": datetime.now(timezone.utc).isoformat(),
-        "name": f"DemoMalware-{i % 1000}",
-        "is_family": False,
-    }
+def make_malware(i: int, now_iso: str):
+    object_id = f"malware--{uuid.uuid4()}"
+    return object_id, MALWARE_TMPL % (object_id, now_iso, now_iso, i % 1000)
 
 
-def make_attack_pattern(i: int):
-    uid = str(uuid.uuid4())
-    return {
-        "type": "attack-pattern",
-        "id": f"attack-pattern--{uid}",
-        "created": datetime.now(timezone.utc).isoformat(),
-        "modified": datetime.now(timezone.utc).isoformat(),
-        "name": f"Example Attack Pattern {(i % 200)}",
-    }
+def make_attack_pattern(i: int, now_iso: str):
+    object_id = f"attack-pattern--{uuid.uuid4()}"
+    return object_id, ATTACK_PATTERN_TMPL % (object_id, now_iso, now_iso, i % 200)
 
 
-def make_object(i: int):
+def make_object(i: int, now_iso: str):
+    """Return (object_type, object_id, serialized JSON) for object number i."""
     # distribute types so we have variety
     r = i % 10
     if r < 6:
-        return make_indicator(i)
+        return ("indicator", *make_indicator(i, now_iso))
     elif r < 8:
-        return make_malware(i)
+        return ("malware", *make_malware(i, now_iso))
     else:
-        return make_attack_pattern(i)
+        return ("attack-pattern", *make_attack_pattern(i, now_iso))
+
+
+def make_row(i: int, collection_id: str, now_iso: str):
+    """Build the insert-ready row for object number i (runs in a worker process)."""
+    object_type, object_id, raw = make_object(i, now_iso)
+    return {
+        "object_id": object_id,
+        "object_type": object_type,
+        "raw": raw.encode(),
+        "collection_id": collection_id,
+    }
 
 
 def ensure_collection(session, collection_id: str):
-    coll = session.query(Collection).filter_by(id=collection_id).first()
+    coll = session.get(Collection, collection_id)
     if not coll:
         coll = Collection(id=collection_id, title=f"{collection_id}", description="Demo collection")
         session.add(coll)
@@ -102,33 +120,33 @@ def ensure_collection(session, collection_id: str):
     return coll
 
 
-def ingest(count: int, collection_id: str, batch: int = 200):
-    engine = create_engine(config.SQLALCHEMY_DATABASE_URI, echo=config.SQLALCHEMY_ECHO)
+def ingest(count: int, collection_id: str, batch: int = 10_000, workers: int = None):
+    engine = config.get_engine()
     Session = sessionmaker(bind=engine)
     session = Session()
 
     ensure_collection(session, collection_id)
 
-    to_commit = []
+    # plain row dicts go through a Core executemany, which SQLAlchemy turns into
+    # multi-VALUES INSERTs instead of one INSERT per ORM instance
+    insert_stmt = STIXObject.__table__.insert()
     total_inserted = 0
 
-    for i in range(1, count + 1):
-        obj = make_object(i)
-        st = STIXObject(
-            object_id=obj.get("id"),
-            object_type=obj.get("type"),
-            raw=json.dumps(obj, ensure_ascii=False),
-            collection_id=collection_id,
-        )
-        session.add(st)
-        total_inserted += 1
-
-        if total_inserted % batch == 0:
+    # object generation is pure CPU, so it is fanned out to worker processes
+    # while this process only does the batched inserts
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for start in range(1, count + 1, batch):
+            stop = min(start + batch, count + 1)
+            # all objects in a batch share one timestamp
+            now_iso = datetime.now(timezone.utc).isoformat()
+            build = partial(make_row, collection_id=collection_id, now_iso=now_iso)
+            rows = list(executor.map(build, range(start, stop), chunksize=1000))
+
+            session.execute(insert_stmt, rows)
             session.commit()
+            total_inserted += len(rows)
             print(f"Committed {total_inserted} objects so far...")
 
-    # final commit
-    session.commit()
     print(f"Ingestion complete: {total_inserted} objects inserted into collection '{collection_id}'")
 
 
@@ -136,14 +154,15 @@ def main():
     parser = argparse.ArgumentParser(description="Generate and ingest demo STIX IoC objects into the DB")
     parser.add_argument("--count", type=int, default=1000, help="Number of objects to generate (default 1000)")
     parser.add_argument("--collection", type=str, default="default_collection", help="Target collection id")
-    parser.add_argument("--batch", type=int, default=200, help="Batch commit size")
+    parser.add_argument("--batch", type=int, default=10_000, help="Rows per bulk INSERT/commit (default 10000)")
+    parser.add_argument("--workers", type=int, default=None, help="Generator processes (default: CPU count)")
 
     args = parser.parse_args()
 
     print(f"Connecting to DB at: {config.SQLALCHEMY_DATABASE_URI}")
     print(f"Will insert {args.count} objects into collection '{args.collection}' with batch={args.batch}")
 
-    ingest(args.count, args.collection, args.batch)
+    ingest(args.count, args.collection, args.batch, args.workers)
 
 
 if __name__ == "__main__":
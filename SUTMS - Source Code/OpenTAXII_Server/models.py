@@ -3,11 +3,13 @@ from sqlalchemy import (
     Integer,
     String,
     Text,
+    LargeBinary,
     DateTime,
     ForeignKey,
     func,
     Index,
 )
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -28,7 +30,8 @@ class STIXObject(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     object_id = Column(String(255), nullable=False, index=True)
     object_type = Column(String(100), nullable=False, index=True)
-    raw = Column(Text, nullable=False)
+    # serialized STIX JSON, stored as bytes so it can be served without re-encoding
+    raw = Column(LargeBinary().with_variant(LONGBLOB(), "mysql"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     collection_id = Column(String(100), ForeignKey("collections.id"), nullable=False)
 
@@ -38,3 +41,12 @@ class STIXObject(Base):
 # indexes
 Index("ix_stix_objects_object_id", STIXObject.object_id)
 Index("ix_stix_objects_object_type", STIXObject.object_type)
+# keyset pagination over a collection. The pages are ordered created_at DESC,
+# id DESC; both columns ascending lets InnoDB serve that with a backward scan
+# (a mixed DESC/ASC index would still need a filesort)
+Index(
+    "ix_stix_objects_coll_created_id",
+    STIXObject.collection_id,
+    STIXObject.created_at,
+    STIXObject.id,
+)
@@ -4,10 +4,13 @@ Fetch ntopng L7 protocol counters and maintain
 a rolling 60-minute record of all observed protocols.
 """
 
+import os
 import requests
-import json
+import orjson
 import logging
-from datetime import datetime, timedelta
+from bisect import bisect_right
+from collections import Counter, deque
+from datetime import datetime, timezone
 from pathlib import Path
 from suricata_rule_sync import suricata_rule_sync
 
@@ -29,13 +32,22 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
 )
 
+# Rolling protocol history; one record per cron run (every minute), so the
+# window never needs more than WINDOW_MINUTES entries even if pruning misses
+HISTORY = deque(maxlen=WINDOW_MINUTES)
+
+# Persistent HTTP session: keeps the ntopng connection alive between calls
+_SESSION = requests.Session()
+_SESSION.auth = (NTOP_USER, NTOP_PASS)
+_SESSION.headers["Accept"] = "application/json"
+
 def fetch_protocols():
     """Fetch current L7 protocols from ntopng REST API."""
     url = f"{NTOP_HOST}/lua/rest/v2/get/flow/l7/counters.lua?ifid={IFID}"
     try:
-        resp = requests.get(url, auth=(NTOP_USER, NTOP_PASS), timeout=10)
+        resp = _SESSION.get(url, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         if data.get("rc") != 0 or "rsp" not in data:
             logging.warning("Unexpected ntopng response: %s", data)
             return []
@@ -50,57 +62,76 @@ def fetch_protocols():
 
 
 def load_history():
-    """Load previous 60-minute protocol history."""
+    """Load previous 60-minute protocol history into HISTORY (newest records kept)."""
+    HISTORY.clear()
     if HISTORY_FILE.exists():
         try:
-            with open(HISTORY_FILE) as f:
-                return json.load(f)
+            HISTORY.extend(orjson.loads(HISTORY_FILE.read_bytes()))
         except Exception:
-            return []
-    return []
+            pass
+    return HISTORY
+
+
+def write_json_atomic(path, obj):
+    """Write obj as compact JSON via a temp file + rename, so a crash mid-write
+    never leaves a truncated file behind."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(orjson.dumps(obj))
+    os.replace(tmp, path)
 
 
 def save_history(history):
     """Persist updated protocol history."""
     HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+    write_json_atomic(HISTORY_FILE, list(history))
+
+
+def record_epoch(record):
+    """Epoch seconds of a history record (older records only carry the ISO timestamp)."""
+    epoch = record.get("ts_epoch")
+    if epoch is None:
+        epoch = datetime.fromisoformat(record["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+    return epoch
 
 
 def prune_history(history):
-    """Remove records older than 60 minutes."""
-    cutoff = datetime.utcnow() - timedelta(minutes=WINDOW_MINUTES)
-    return [h for h in history if datetime.fromisoformat(h["timestamp"]) > cutoff]
+    """Remove records older than 60 minutes from the history deque, in place.
+
+    Records are appended in time order, so the expired ones are a prefix and
+    the cut point is found by bisecting the stored epoch seconds.
+    """
+    cutoff = datetime.now(timezone.utc).timestamp() - WINDOW_MINUTES * 60
+    epochs = [record_epoch(h) for h in history]
+    for _ in range(bisect_right(epochs, cutoff)):
+        history.popleft()
+    return history
 
 
 def aggregate_protocols(history):
-    """Combine protocol counts across the 60-minute window."""
-    agg = {}
+    """Combine protocol counts across the 60-minute window.
+
+    Returns (name, count) pairs, highest count first.
+    """
+    agg = Counter()
     for record in history:
-        for p in record["protocols"]:
-            name = p["name"]
-            agg[name] = agg.get(name, 0) + p["count"]
-    return sorted(
-        [{"name": k, "count": v} for k, v in agg.items()],
-        key=lambda x: (-x["count"], x["name"])
-    )
+        agg.update({p["name"]: p["count"] for p in record["protocols"]})
+    return sorted(agg.items(), key=lambda kv: (-kv[1], kv[0]))
 
 
 def save_outputs(protocols):
     """Write final TXT and JSON outputs."""
     # Save unique protocol names for Suricata
     with open(OUT_FILE_TXT, "w") as f:
-        for p in protocols:
-            f.write(p["name"] + "\n")
+        for name, _ in protocols:
+            f.write(name + "\n")
 
     # Save aggregated JSON with timestamp
     snapshot = {
         "timestamp": datetime.utcnow().isoformat(),
         "window_minutes": WINDOW_MINUTES,
-        "protocols": protocols
+        "protocols": [{"name": name, "count": count} for name, count in protocols]
     }
-    with open(OUT_FILE_JSON, "w") as f:
-        json.dump(snapshot, f, indent=2)
+    write_json_atomic(OUT_FILE_JSON, snapshot)
 
     logging.info(
         "Saved %d protocols covering last %d min",
@@ -112,8 +143,12 @@ if __name__ == "__main__":
     now = datetime.utcnow()
     current = fetch_protocols()
     history = load_history()
-    history.append({"timestamp": now.isoformat(), "protocols": current})
-    history = prune_history(history)
+    history.append({
+        "timestamp": now.isoformat(),
+        "ts_epoch": now.replace(tzinfo=timezone.utc).timestamp(),
+        "protocols": current,
+    })
+    prune_history(history)
     save_history(history)
     aggregated = aggregate_protocols(history)
     save_outputs(aggregated)
@@ -8,6 +8,7 @@ import os
 import subprocess
 import logging
 import hashlib
+from functools import lru_cache
 from pathlib import Path
 
 # ---------------- CONFIG ----------------
@@ -41,6 +42,9 @@ PROTO_TO_RULE = {
 }
 # ----------------------------------------
 
+# Lower-cased view of PROTO_TO_RULE so lookups need a single case fold
+PROTO_TO_RULE_LOWER = {k.lower(): v.lower() for k, v in PROTO_TO_RULE.items()}
+
 logging.basicConfig(
     filename=LOG_FILE,
     level=logging.INFO,
@@ -57,11 +61,25 @@ def get_active_protocols():
     return prots
 
 
+def _mtime(path):
+    """Modification time of path (ns), or None if it does not exist."""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
 def get_all_rule_categories(rule_dir=SURICATA_RULE_DIR):
+    # directory mtime changes whenever a rule file is added, removed or renamed
+    return _scan_rule_categories(rule_dir, _mtime(rule_dir))
+
+
+@lru_cache(maxsize=4)
+def _scan_rule_categories(rule_dir, mtime):
     categories = set()
-    if not rule_dir.exists():
+    if mtime is None:
         logging.error("Suricata rule directory not found: %s", rule_dir)
-        return categories
+        return frozenset(categories)
 
     for rfile in rule_dir.glob("*.rules"):
         stem = rfile.stem
@@ -71,33 +89,35 @@ def get_all_rule_categories(rule_dir=SURICATA_RULE_DIR):
             candidate = stem.lower()
         categories.add(candidate)
     logging.info("Discovered rule categories: %s", sorted(categories))
-    return categories
+    return frozenset(categories)
 
 
 def load_whitelist():
     """Load whitelisted rule categories (always enabled)."""
-    if not WHITELIST_FILE.exists():
-        logging.info("No whitelist found (%s). Continuing without it.", WHITELIST_FILE)
-        return set()
-    with open(WHITELIST_FILE) as f:
+    return _read_whitelist(WHITELIST_FILE, _mtime(WHITELIST_FILE))
+
+
+@lru_cache(maxsize=4)
+def _read_whitelist(path, mtime):
+    if mtime is None:
+        logging.info("No whitelist found (%s). Continuing without it.", path)
+        return frozenset()
+    with open(path) as f:
         wl = {line.strip().lower() for line in f if line.strip() and not line.startswith("#")}
     logging.info("Loaded whitelist: %s", sorted(wl))
-    return wl
+    return frozenset(wl)
 
 
 def map_protocols_to_categories(active_protocols, all_categories):
     active_cats = set()
     for p in active_protocols:
-        pu = p.upper()
-        if pu in PROTO_TO_RULE:
-            active_cats.add(PROTO_TO_RULE[pu].lower())
-            continue
-
         pl = p.lower()
-        if pl in all_categories:
-            active_cats.add(pl)
+        cat = PROTO_TO_RULE_LOWER.get(pl) or (pl if pl in all_categories else None)
+        if cat:
+            active_cats.add(cat)
             continue
 
+        # substring match is the slow path; only taken for unmapped protocols
         for cat in all_categories:
             if cat in pl or pl in cat:
                 active_cats.add(cat)
@@ -117,22 +137,18 @@ def build_disable_content(all_categories, enabled_categories, whitelist):
 def file_checksum(path):
     if not path.exists():
         return None
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        while chunk := f.read(8192):
-            h.update(chunk)
-    return h.hexdigest()
+    # disable.conf is small enough to hash in one read
+    return hashlib.sha256(path.read_bytes()).hexdigest()
 
 
 def write_if_changed(path, content):
-    tmp = Path(str(path) + ".tmp")
-    tmp.write_text(content)
-    old_sum = file_checksum(path)
-    new_sum = hashlib.sha256(content.encode()).hexdigest()
-    if old_sum == new_sum:
+    data = content.encode()
+    if file_checksum(path) == hashlib.sha256(data).hexdigest():
         logging.info("No change to %s — skipping write.", path)
-        tmp.unlink(missing_ok=True)
         return False
+    # only now pay for the temp file; rename keeps the swap atomic for readers
+    tmp = Path(str(path) + ".tmp")
+    tmp.write_bytes(data)
     tmp.replace(path)
     logging.info("Updated %s (checksum changed).", path)
     return True
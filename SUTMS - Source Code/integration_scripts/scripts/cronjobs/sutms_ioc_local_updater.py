@@ -3,17 +3,32 @@
 SUTMS IoC Updater (OpenTAXII + Local Fallback)
 -----------------------------------------------
 Fetches Indicators of Compromise (IoCs) from an OpenTAXII server,
-extracts malicious IPs from STIX data, and adds iptables DROP rules.
+extracts malicious IPs from STIX data, and adds them to an ipset that a
+single iptables DROP rule matches against.
 Falls back to local IoC file if TAXII fetch fails.
 """
 
 import subprocess
+import atexit
+import io
 import json
+import logging
+import logging.handlers
 import os
+import queue
 import re
-from datetime import datetime
-from cabby import create_client
-from stix2 import parse
+from importlib.util import find_spec
+from ipaddress import IPv4Address
+
+try:
+    import hyperscan
+except ImportError:  # optional; plain `re` is used when unavailable
+    hyperscan = None
+
+try:
+    import re2  # google-re2: linear-time DFA, drop-in for compile/findall
+except ImportError:
+    re2 = None
 
 # ================= CONFIGURATION =================
 
@@ -29,43 +44,141 @@ PASSWORD = "admin"
 # Local fallback IoC file
 LOCAL_IOC_FILE = "sample_stix.json"
 
-# iptables command
+# iptables / ipset commands
 IPTABLES_CMD = "/sbin/iptables"
+IPSET_CMD = "/sbin/ipset"
+
+# ipset holding all blocked IoC addresses (matched by a single INPUT rule)
+IPSET_NAME = "sutms_block"
+
+# addresses per `ipset restore` call
+IPSET_CHUNK = 1000
 
 # Log file
 LOG_FILE = "ioc_update.log"
 
 # =================================================
 
-# Regex for IPv4 addresses
-IPV4_RE = re.compile(r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b")
+# Regex for IPv4 addresses; RE2 when installed, since stdlib re backtracks
+IPV4_PATTERN = r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b"
+IPV4_RE = (re2 or re).compile(IPV4_PATTERN)
+
+# "pattern": "<JSON string>" members of a serialized STIX bundle
+STIX_PATTERN_RE = re.compile(rb'"pattern"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _compile_ipv4_db():
+    """Compile IPV4_PATTERN into a Hyperscan block-mode database, if available."""
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[IPV4_PATTERN.encode()],
+        ids=[0],
+        elements=1,
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST],
+    )
+    return db
+
+
+IPV4_HS_DB = _compile_ipv4_db()
+
+
+def _setup_file_log():
+    """File logger whose writes happen on a QueueListener thread.
+
+    The log file stays open for the whole run instead of being reopened for
+    every message; the listener is stopped (and the queue drained) at exit.
+    """
+    q = queue.SimpleQueue()
+    file_handler = logging.handlers.TimedRotatingFileHandler(LOG_FILE, when="midnight", backupCount=7)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s  %(message)s", "%Y-%m-%d %H:%M:%S"))
+    listener = logging.handlers.QueueListener(q, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger("sutms.iptables")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(q))
+    return logger
+
+
+_log = _setup_file_log()
 
 
 # ---------------- Utility Functions ----------------
 
+def find_ipv4(text):
+    """Return every IPv4-looking substring of text.
+
+    Large IoC feeds are scanned with Hyperscan's vectorized DFA in one call
+    when the module is installed; otherwise this is IPV4_RE.findall() (RE2
+    or stdlib re).
+    """
+    if IPV4_HS_DB is None:
+        return IPV4_RE.findall(text)
+
+    buf = text.encode()
+    hits = []
+    last_end = 0
+
+    def on_match(_id, start, end, _flags, _context):
+        # Hyperscan reports overlapping matches; keep findall()'s
+        # non-overlapping, leftmost ones
+        nonlocal last_end
+        if start < last_end:
+            return
+        last_end = end
+        hits.append(buf[start:end].decode())
+
+    IPV4_HS_DB.scan(buf, match_event_handler=on_match)
+    return hits
+
+
+def _canonical_ipv4(s):
+    """Return s as a canonical dotted quad, or None if it is not a valid address.
+
+    IPV4_RE also accepts strings like 999.1.1.1 or 010.1.1.1; IPv4Address
+    rejects out-of-range octets and leading zeros (which inet_aton would read
+    as octal), so what reaches ipset is exactly what `ipset save` reports.
+    """
+    try:
+        return str(IPv4Address(s))
+    except ValueError:
+        return None
+
+
 def log(msg):
     """Write logs to console and file."""
     print(msg)
-    with open(LOG_FILE, "a") as f:
-        f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}  {msg}\n")
+    _log.info(msg)
 
 
 def extract_ips_from_stix(stix_data):
-    """Extract IPv4 addresses from STIX bundle."""
-    indicators = []
-    try:
-        bundle = parse(stix_data, allow_custom=True)
-        for obj in bundle.objects:
-            if obj.type == "indicator" and "pattern" in obj:
-                ips = IPV4_RE.findall(obj.pattern)
-                indicators.extend(ips)
-    except Exception as e:
-        log(f"[!] Failed to parse STIX data: {e}")
-    return list(set(indicators))
+    """Extract IPv4 addresses from the indicator patterns of a STIX bundle.
+
+    Instead of building the stix2 object graph, the "pattern" string values
+    are picked out of the raw JSON (str/bytes; a dict is re-serialized) and
+    only those are scanned, so addresses in observables, sightings or
+    descriptions are not blocked.
+    """
+    if isinstance(stix_data, str):
+        stix_data = stix_data.encode()
+    elif not isinstance(stix_data, bytes):
+        stix_data = json.dumps(stix_data).encode()
+    patterns = "\n".join(m.decode("utf-8", "replace") for m in STIX_PATTERN_RE.findall(stix_data))
+    return {ip for ip in map(_canonical_ipv4, find_ipv4(patterns)) if ip}
 
 
 def fetch_iocs_from_taxii():
     """Fetch IoCs from OpenTAXII server."""
+    # cabby is imported here so runs that end up on the local file never pay
+    # for it; without it main() falls back to the local file straight away
+    if find_spec("cabby") is None:
+        raise RuntimeError("cabby is not installed")
+    from cabby import create_client
+
     log(f"[+] Connecting to OpenTAXII server: {TAXII_SERVER}{DISCOVERY_PATH}")
     client = create_client(
         TAXII_SERVER,
@@ -77,7 +190,7 @@ def fetch_iocs_from_taxii():
     log("[+] Discovering available collections...")
     collections = client.get_collections()
     found = False
-    indicators = []
+    indicators = set()
 
     for collection in collections:
         if COLLECTION.lower() in collection.name.lower():
@@ -86,8 +199,7 @@ def fetch_iocs_from_taxii():
             content_blocks = client.poll(collection.name)
             for block in content_blocks:
                 try:
-                    stix_data = json.loads(block.content)
-                    indicators.extend(extract_ips_from_stix(stix_data))
+                    indicators.update(extract_ips_from_stix(block.content))
                 except Exception as e:
                     log(f"[!] Error parsing content block: {e}")
             break
@@ -95,7 +207,7 @@ def fetch_iocs_from_taxii():
     if not found:
         raise RuntimeError(f"Collection '{COLLECTION}' not found on server.")
 
-    return list(set(indicators))
+    return indicators
 
 
 def load_local_iocs():
@@ -103,27 +215,80 @@ def load_local_iocs():
     log(f"[+] Loading local IoCs from {LOCAL_IOC_FILE}")
     if not os.path.isfile(LOCAL_IOC_FILE):
         log(f"[!] Local IoC file not found: {LOCAL_IOC_FILE}")
-        return []
+        return set()
 
     with open(LOCAL_IOC_FILE, "r") as f:
         data = f.read()
 
-    ips = IPV4_RE.findall(data)
-    return list(set(ips))
-
-
-def rule_exists(ip):
-    """Check if iptables rule already exists."""
-    cmd = [IPTABLES_CMD, "-C", "INPUT", "-s", ip, "-j", "DROP"]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return result.returncode == 0
-
+    return {ip for ip in map(_canonical_ipv4, find_ipv4(data)) if ip}
+
+
+def _run(cmd, **kwargs):
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs)
+
+
+def ensure_ipset():
+    """Create the IoC ipset and its INPUT DROP rule if they do not exist yet.
+
+    Returns False (after logging stderr) if either could not be created.
+    """
+    if _run(["sudo", IPSET_CMD, "-name", "list", IPSET_NAME]).returncode != 0:
+        result = _run(["sudo", IPSET_CMD, "create", IPSET_NAME, "hash:ip"])
+        if result.returncode != 0:
+            log(f"[ERROR] ipset create {IPSET_NAME} failed: {result.stderr.strip()}")
+            return False
+        log(f"[+] Created ipset {IPSET_NAME}")
+
+    match_rule = ["INPUT", "-m", "set", "--match-set", IPSET_NAME, "src", "-j", "DROP"]
+    if _run(["sudo", IPTABLES_CMD, "-C", *match_rule]).returncode != 0:
+        result = _run(["sudo", IPTABLES_CMD, "-I", *match_rule])
+        if result.returncode != 0:
+            log(f"[ERROR] iptables rule for {IPSET_NAME} failed: {result.stderr.strip()}")
+            return False
+        log(f"[+] Installed iptables rule dropping sources in {IPSET_NAME}")
+    return True
+
+
+def load_blocked_ips():
+    """Return the addresses currently in the IoC ipset (one `ipset save` call)."""
+    result = _run(["sudo", IPSET_CMD, "save", IPSET_NAME])
+    blocked = set()
+    for line in result.stdout.splitlines():
+        # add sutms_block 1.2.3.4
+        parts = line.split()
+        if len(parts) >= 3 and parts[0] == "add":
+            blocked.add(parts[2])
+    return frozenset(blocked)
+
+
+def bulk_add(ips):
+    """Add IPs (a sequence) to the IoC ipset, IPSET_CHUNK per `ipset restore`.
+
+    A chunk that fails is logged and skipped; later chunks are still sent.
+    Returns (added, failed) address counts.
+    """
+    sent = 0
+    failed_chunks = []
+    for i in range(0, len(ips), IPSET_CHUNK):
+        chunk = ips[i:i + IPSET_CHUNK]
+        buf = io.StringIO()
+        for ip in chunk:
+            buf.write(f"add {IPSET_NAME} {ip}\n")
+        result = _run(["sudo", IPSET_CMD, "restore", "-!"], input=buf.getvalue())
+        if result.returncode != 0:
+            log(f"[ERROR] ipset restore failed in chunk {chunk[0]} .. {chunk[-1]}: {result.stderr.strip()}")
+            failed_chunks.append(chunk)
+            continue
+        sent += len(chunk)
+        log(f"[BLOCKED] {sent}/{len(ips)} ({chunk[0]} .. {chunk[-1]})")
 
-def add_rule(ip):
-    """Add DROP rule for a specific IP address."""
-    cmd = ["sudo", IPTABLES_CMD, "-A", "INPUT", "-s", ip, "-j", "DROP"]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return result.returncode == 0
+    failed = 0
+    if failed_chunks:
+        # restore applies the lines before the one it rejects, so check which
+        # addresses of the failed chunks actually landed
+        blocked = load_blocked_ips()
+        failed = sum(ip not in blocked for chunk in failed_chunks for ip in chunk)
+    return len(ips) - failed, failed
 
 
 # ---------------- Main Logic ----------------
@@ -146,21 +311,21 @@ def main():
         return
 
     log(f"[+] Total IoCs loaded: {len(ioc_ips)}")
-    added = 0
 
-    for ip in ioc_ips:
-        if not IPV4_RE.match(ip):
-            continue
-        if rule_exists(ip):
-            log(f"[SKIP] {ip} already blocked.")
-            continue
-        if add_rule(ip):
-            log(f"[BLOCKED] {ip}")
-            added += 1
-        else:
-            log(f"[ERROR] Failed to block {ip}")
+    if not ensure_ipset():
+        log("[!] Firewall setup failed; no IPs blocked.\n")
+        return
+
+    already_blocked = load_blocked_ips()
+    new_ips = ioc_ips - already_blocked
+    log(f"[SKIP] {len(ioc_ips) - len(new_ips)} IoCs already blocked.")
 
-    log(f"[+] Completed. {added} new IPs blocked.")
+    added, failed = bulk_add(sorted(new_ips))
+
+    log(f"[+] Completed. {added} new IPs blocked, {failed} failed.")
+    if failed:
+        log(f"[!] Firewall update incomplete: {failed} IPs not blocked.\n")
+        return
     log("[+] Firewall rules updated successfully.\n")
 
 
@@ -7,16 +7,24 @@ Flask backend for SUTMS UI
 
 import json
 import os
+import re
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import orjson
+from cachetools import TTLCache
 from datetime import datetime, timedelta
 from flask import Flask, jsonify, send_from_directory, render_template, request, redirect
 import requests
+from requests.adapters import HTTPAdapter
 from dateutil import parser as dtparser
 import psutil
 from utils import get_system_health_stats
 from utils_host import get_active_hosts
 from utils_interface import get_network_interfaces
-from utils_log import read_fast_log, categorize_event
+from utils_log import read_fast_log, categorize_event, tail_lines
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -35,19 +43,57 @@ CACHE_SECONDS = int(cfg.get("CACHE_SECONDS", 30))
 NTOP_UI_PORT = int(cfg.get("NTOP_UI_PORT", 3000))
 SURICATA_UI_PORT = int(cfg.get("SURICATA_UI_PORT", 10000))
 
-# Simple in-memory cache to avoid frequent reads
-_cached = {}
+# Bounded, thread-safe in-memory cache to avoid frequent reads
+_cache = TTLCache(maxsize=64, ttl=CACHE_SECONDS)
+_cache_lock = threading.Lock()
+_inflight = {}  # key -> Event set when the fetch currently running for it finishes
+
 def cache_get(key):
-    entry = _cached.get(key)
-    if not entry:
-        return None
-    ts, val = entry
-    if time.time() - ts > CACHE_SECONDS:
-        return None
-    return val
+    with _cache_lock:
+        return _cache.get(key)
 
 def cache_set(key, val):
-    _cached[key] = (time.time(), val)
+    with _cache_lock:
+        _cache[key] = val
+
+def cache_fetch(key, fetch):
+    """Return the cached value for key, calling fetch() on a miss.
+
+    Concurrent misses on the same key wait for the first caller's fetch
+    instead of all hitting ntop/eve.json at once. fetch() stores its own result
+    with cache_set.
+    """
+    with _cache_lock:
+        val = _cache.get(key)
+        if val:
+            return val
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = _inflight[key] = threading.Event()
+            leader = True
+        else:
+            leader = False
+
+    if not leader:
+        pending.wait(timeout=30)
+        val = cache_get(key)
+        return val if val else fetch()
+
+    try:
+        return fetch()
+    finally:
+        with _cache_lock:
+            _inflight.pop(key, None)
+        pending.set()
+
+# Keep-alive session for ntop polling; endpoint probing already tries several
+# URLs, so no adapter-level retries here
+_ntop_session = requests.Session()
+_ntop_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+_ntop_session.mount("http://", _ntop_adapter)
+_ntop_session.mount("https://", _ntop_adapter)
+if NTOP_KEY:
+    _ntop_session.headers["X-API-Key"] = NTOP_KEY
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
@@ -62,17 +108,9 @@ def read_sample(path):
 def query_ntop_traffic():
     """Query ntopng for traffic metrics (top talkers / bytes over time).
        This is a pragmatic, robust approach: try ntop endpoints; fallback to sample JSON."""
-    cached = cache_get("ntop_traffic")
-    if cached:
-        return cached
-
     try:
         # Example: get top N hosts (ntopng REST: /lua/rest/v2/ hosts endpoints differ by versions)
         # We'll try a couple of endpoints and parse results safely.
-        headers = {}
-        if NTOP_KEY:
-            headers["X-API-Key"] = NTOP_KEY
-
         # 1) /lua/rest/v2/hosts/top10? (older/newer ntop may vary)
         urls_to_try = [
             f"{NTOP_URL}/lua/rest/v2/hosts/top10",      # possible ntop v.2 style
@@ -82,7 +120,7 @@ def query_ntop_traffic():
         resp_data = None
         for u in urls_to_try:
             try:
-                r = requests.get(u, headers=headers, timeout=4)
+                r = _ntop_session.get(u, timeout=4)
                 if r.status_code == 200:
                     # attempt JSON decode
                     try:
@@ -112,19 +150,19 @@ def query_ntop_traffic():
             # can't guarantee structure across ntop versions — return raw
             top = [{"raw": resp_data}]
 
-        result = {"top_talkers": top, "source": "ntop"}
-        cache_set("ntop_traffic", result)
-        return result
+        return {"top_talkers": top, "source": "ntop"}
 
     except Exception as e:
         app.logger.warning("ntop query failed: %s", e)
         if NTOP_FALLBACK:
             sample = read_sample("sample_ntop.json")
             if sample:
-                cache_set("ntop_traffic", sample)
                 return sample
         return {"top_talkers": [], "source": "none"}
 
+# stats.log table row: "<counter> | <TM name> | <value>"
+_STATS_RE = re.compile(r'^\s*([^\s|][^|]*?)\s*\|[^|]*\|\s*(\S+)\s*$')
+
 def read_suricata_stats():
     """Return a dict with parsed Suricata stats pulled from eve.json (latest stats event)
     and the stats.log counters (if present).
@@ -133,18 +171,17 @@ def read_suricata_stats():
     # 1) try parse latest stats event from eve.json
     try:
         if os.path.isfile(SURICATA_PATH):
-            with open(SURICATA_PATH, 'r') as fh:
-                # read lines from end to find first stats event
-                for line in reversed(fh.readlines()):
-                    if not line.strip():
-                        continue
-                    try:
-                        obj = json.loads(line)
-                    except Exception:
-                        continue
-                    if obj.get('event_type') == 'stats':
-                        result['eve'] = obj.get('stats') or obj
-                        break
+            # read lines from end to find first stats event
+            for line in tail_lines(SURICATA_PATH):
+                if not line.strip():
+                    continue
+                try:
+                    obj = orjson.loads(line)
+                except Exception:
+                    continue
+                if obj.get('event_type') == 'stats':
+                    result['eve'] = obj.get('stats') or obj
+                    break
     except Exception as e:
         app.logger.debug(f"read_suricata_stats: failed reading eve.json: {e}")
 
@@ -152,150 +189,148 @@ def read_suricata_stats():
     stats_log = '/var/log/suricata/stats.log'
     try:
         if os.path.isfile(stats_log):
-            with open(stats_log, 'r') as fh:
-                lines = fh.readlines()
-            # find the table footer header line starting with 'Counter' or the dashed line
-            # then parse subsequent lines that follow the table header
-            parsing = False
-            for ln in lines:
-                if 'Counter' in ln and 'TM Name' in ln:
-                    parsing = True
-                    continue
-                if not parsing:
-                    continue
-                # skip separator lines
-                if ln.strip().startswith('---'):
+            # stats.log appends a full table per interval; only the latest one
+            # matters, so read backwards from the end up to its header row
+            rows = []
+            for raw in tail_lines(stats_log):
+                if b'TM Name' in raw:
+                    break
+                rows.append(raw)
+            else:
+                rows = []  # no table header at all
+            for raw in reversed(rows):
+                ln = raw.decode('utf-8', 'replace')
+                # separator and Date lines have no '|' columns and don't match
+                m = _STATS_RE.match(ln)
+                if not m:
                     continue
-                parts = [p.strip() for p in ln.split('|')]
-                if len(parts) >= 3:
-                    counter = parts[0]
-                    value = parts[-1]
-                    # try to parse numeric value
-                    try:
-                        val = int(value)
-                    except Exception:
-                        try:
-                            val = float(value)
-                        except Exception:
-                            val = value
-                    result['counters'][counter] = val
+                counter, value = m.group(1), m.group(2)
+                # parse numeric value without raising on every non-int
+                digits = value.lstrip('-')
+                if digits.isdigit():
+                    val = int(value)
+                elif digits.replace('.', '', 1).isdigit():
+                    val = float(value)
+                else:
+                    val = value
+                result['counters'][counter] = val
     except Exception as e:
         app.logger.debug(f"read_suricata_stats: failed reading stats.log: {e}")
 
     return result
 
+EVE_EVENT_TYPES = ("alert", "dns", "stats", "flow")
+
+# Incremental eve.json reader: byte offset consumed so far (always at a line
+# boundary), inode to detect rotation, and the latest summarized events
+# (oldest first). Polls only parse what Suricata appended since the last one.
+_eve_state = {"size": 0, "ino": None, "events": deque(maxlen=500)}
+_eve_lock = threading.Lock()
+
+# Suricata writes one compact JSON object per line, so the event type can be
+# checked on the raw bytes; the (majority) http/tls/fileinfo/... lines are
+# dropped by this one C-level search without ever being decoded.
+_EVE_TYPE_RE = re.compile(rb'"event_type": ?"(?:%s)"' % b"|".join(t.encode() for t in EVE_EVENT_TYPES))
+
+def summarize_eve_event(obj):
+    """Reduce an eve.json record to the fields shown in the UI, or None if not shown."""
+    get = obj.get
+    event_type = get("event_type")
+    if event_type not in EVE_EVENT_TYPES:
+        return None
+    alert = get("alert") or {}
+    # Add status categorization
+    return {
+        "timestamp": get("timestamp"),
+        "src_ip": get("src_ip"),
+        "dest_ip": get("dest_ip"),
+        "event_type": event_type,
+        "status": categorize_event(obj),
+        "details": alert.get("signature") or (get("dns") or {}).get("rrname") or (get("flow") or {}).get("state"),
+        "severity": alert.get("severity")
+    }
+
+def _parse_eve_line(line):
+    if not _EVE_TYPE_RE.search(line):
+        return None
+    try:
+        return summarize_eve_event(orjson.loads(line))
+    except Exception:
+        return None
+
+def refresh_eve_events():
+    """Bring _eve_state up to date with eve.json and return the event deque."""
+    st = os.stat(SURICATA_PATH)
+    events = _eve_state["events"]
+    size = _eve_state["size"]
+
+    if _eve_state["ino"] != st.st_ino or st.st_size < size:
+        # first read or log rotated: seed from the tail of the file only
+        events.clear()
+        lines = tail_lines(SURICATA_PATH, end=st.st_size)
+        # a last line without its newline is still being written; leave it
+        # for the incremental read
+        partial = next(lines, b"")
+        seed = []
+        for line in lines:
+            ev = _parse_eve_line(line)
+            if ev:
+                seed.append(ev)
+                if len(seed) >= events.maxlen:
+                    break
+        events.extend(reversed(seed))
+        _eve_state["ino"] = st.st_ino
+        _eve_state["size"] = st.st_size - len(partial)
+    elif st.st_size > size:
+        with open(SURICATA_PATH, "rb") as fh:
+            fh.seek(size)
+            chunk = fh.read(st.st_size - size)
+        complete = chunk.rfind(b"\n") + 1
+        for line in chunk[:complete].split(b"\n"):
+            ev = _parse_eve_line(line)
+            if ev:
+                events.append(ev)
+        _eve_state["size"] = size + complete
+    return events
+
 def read_suricata_eve(limit=50):
     """Read suricata eve.json and extract latest events with their status."""
-    cached = cache_get("suricata_events")
-    if cached:
-        return cached
-
-    events = []
     try:
-        if os.path.isfile(SURICATA_PATH):
-            fpath = SURICATA_PATH
-            with open(fpath, "r") as fh:
-                # eve.json is newline-delimited JSON objects
-                lines = fh.readlines() if fh else []
-                # take last N non-empty lines
-                for line in reversed(lines):
-                    if not line.strip(): continue
-                    try:
-                        obj = json.loads(line)
-                        if obj.get("event_type") in ("alert", "dns", "stats", "flow"):
-                            # Add status categorization
-                            events.append({
-                                "timestamp": obj.get("timestamp"),
-                                "src_ip": obj.get("src_ip"),
-                                "dest_ip": obj.get("dest_ip"),
-                                "event_type": obj.get("event_type"),
-                                "status": categorize_event(obj),
-                                "details": obj.get("alert", {}).get("signature") or obj.get("dns", {}).get("rrname") or obj.get("flow", {}).get("state"),
-                                "severity": obj.get("alert", {}).get("severity")
-                            })
-                        if len(events) >= limit:
-                            break
-                    except Exception:
-                        continue
-        else:
+        if not os.path.isfile(SURICATA_PATH):
             raise FileNotFoundError("eve.json not found")
-        cache_set("suricata_events", events)
-        return events
+        with _eve_lock:
+            # newest first
+            return list(islice(reversed(refresh_eve_events()), limit))
     except Exception as e:
         app.logger.warning("suricata read failed: %s", e)
         if SURICATA_FALLBACK:
             sample = read_sample("sample_eve.json")
             if sample:
-                cache_set("suricata_events", sample.get("events", []))
                 return sample.get("events", [])
         return []
 
 
-    def read_suricata_stats():
-        """Return a dict with parsed Suricata stats pulled from eve.json (latest stats event)
-        and the stats.log counters (if present).
-        """
-        result = {"eve": None, "counters": {}}
-        # 1) try parse latest stats event from eve.json
-        try:
-            if os.path.isfile(SURICATA_PATH):
-                with open(SURICATA_PATH, 'r') as fh:
-                    # read lines from end to find first stats event
-                    for line in reversed(fh.readlines()):
-                        if not line.strip():
-                            continue
-                        try:
-                            obj = json.loads(line)
-                        except Exception:
-                            continue
-                        if obj.get('event_type') == 'stats':
-                            result['eve'] = obj.get('stats') or obj
-                            break
-        except Exception as e:
-            app.logger.debug(f"read_suricata_stats: failed reading eve.json: {e}")
-
-        # 2) try to parse stats.log counters for a concise list
-        stats_log = '/var/log/suricata/stats.log'
-        try:
-            if os.path.isfile(stats_log):
-                with open(stats_log, 'r') as fh:
-                    lines = fh.readlines()
-                # find the table footer header line starting with 'Counter' or the dashed line
-                # then parse subsequent lines that follow the table header
-                parsing = False
-                for ln in lines:
-                    if 'Counter' in ln and 'TM Name' in ln:
-                        parsing = True
-                        continue
-                    if not parsing:
-                        continue
-                    # skip separator lines
-                    if ln.strip().startswith('---'):
-                        continue
-                    parts = [p.strip() for p in ln.split('|')]
-                    if len(parts) >= 3:
-                        counter = parts[0]
-                        value = parts[-1]
-                        # try to parse numeric value
-                        try:
-                            val = int(value)
-                        except Exception:
-                            try:
-                                val = float(value)
-                            except Exception:
-                                val = value
-                        result['counters'][counter] = val
-        except Exception as e:
-            app.logger.debug(f"read_suricata_stats: failed reading stats.log: {e}")
-
-        return result
+THERMAL_PATH = '/sys/class/thermal/thermal_zone0/temp'
+_thermal_fd = None  # kept open; sysfs regenerates the value on each read from 0
+_thermal_lock = threading.Lock()
+_cpu_primed = False   # cpu_percent(None) compares against the previous call
+
+def read_cpu_temp():
+    global _thermal_fd
+    if _thermal_fd is None:
+        with _thermal_lock:
+            if _thermal_fd is None:
+                _thermal_fd = os.open(THERMAL_PATH, os.O_RDONLY)
+    # pread carries its own offset, so the refresh pool and a first-boot
+    # snapshot() can read concurrently without a shared seek position
+    return float(os.pread(_thermal_fd, 32, 0)) / 1000.0  # Convert millicelsius to celsius
 
 def system_stats():
     # Get detailed system stats for Raspberry Pi
+    global _cpu_primed
     cpu_temp = 0
     try:
-        with open('/sys/class/thermal/thermal_zone0/temp') as temp_file:
-            cpu_temp = float(temp_file.read().strip()) / 1000.0  # Convert millicelsius to celsius
+        cpu_temp = read_cpu_temp()
     except Exception as e:
         app.logger.warning(f"Could not read CPU temperature: {e}")
         cpu_temp = 0.0  # Ensure it's a float
@@ -303,8 +338,10 @@ def system_stats():
     # CPU information
     cpu_freq = psutil.cpu_freq()
     cpu_count = psutil.cpu_count()
-    cpu_percent_per_core = psutil.cpu_percent(interval=0.2, percpu=True)
-    cpu_avg = psutil.cpu_percent(interval=0.2)
+    # one per-core sample; only the very first call has to block to get a baseline
+    cpu_percent_per_core = psutil.cpu_percent(interval=None if _cpu_primed else 0.1, percpu=True)
+    _cpu_primed = True
+    cpu_avg = sum(cpu_percent_per_core) / len(cpu_percent_per_core) if cpu_percent_per_core else 0.0
 
     # Memory information
     memory = psutil.virtual_memory()
@@ -335,22 +372,71 @@ def system_stats():
         "ts": datetime.utcnow().isoformat() + "Z"
     }
 
+# ---------- background refresh ----------
+# Everything the pages show is fetched here, off the request thread, so a
+# slow ntop or a large eve.json never holds up a response.
+EVE_SNAPSHOT_LIMIT = 100  # largest limit any page asks for
+
+REFRESH_JOBS = {
+    "ntop_health": lambda: get_system_health_stats(NTOP_URL),
+    "ntop_traffic": query_ntop_traffic,
+    "interfaces": lambda: get_network_interfaces(NTOP_URL),
+    "hosts": lambda: get_active_hosts(NTOP_URL),
+    "suricata_events": lambda: read_suricata_eve(EVE_SNAPSHOT_LIMIT),
+    "system_stats": system_stats,
+}
+_snapshots = {}  # key -> (monotonic time fetched, value)
+# jobs run side by side, so a refresh costs the slowest ntop round trip rather
+# than the sum; the ntop helpers share get_client()'s keep-alive pool
+_refresh_pool = ThreadPoolExecutor(max_workers=len(REFRESH_JOBS), thread_name_prefix="sutms-refresh")
+
+def store_snapshot(key, val):
+    _snapshots[key] = (time.monotonic(), val)
+    cache_set("snapshot:" + key, val)  # lets first-boot waiters in snapshot() pick it up
+    return val
+
+def refresh_snapshot(key):
+    return store_snapshot(key, REFRESH_JOBS[key]())
+
+def _refresh_loop():
+    while True:
+        futures = {key: _refresh_pool.submit(refresh_snapshot, key) for key in REFRESH_JOBS}
+        for key, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                app.logger.warning("background refresh of %s failed: %s", key, e)
+        time.sleep(CACHE_SECONDS)
+
+def snapshot(key):
+    """Return (value, stale) from the background refresher.
+
+    stale is True once the value is more than two refresh periods old. Before
+    the first refresh lands (first boot) the value is fetched synchronously.
+    """
+    entry = _snapshots.get(key)
+    if entry is None:
+        return cache_fetch("snapshot:" + key, lambda: refresh_snapshot(key)), False
+    fetched, val = entry
+    return val, time.monotonic() - fetched > 2 * CACHE_SECONDS
+
+threading.Thread(target=_refresh_loop, name="sutms-refresh", daemon=True).start()
+
 # ---------- API endpoints ----------
 
 @app.route("/api/ntop/health")
 def api_ntop_health():
     try:
-        app.logger.info(f"Attempting to fetch ntop stats from URL: {NTOP_URL}")
-        stats = get_system_health_stats(NTOP_URL)
-        app.logger.info(f"Successfully fetched ntop stats: {stats}")
-        return jsonify(stats)
+        stats, stale = snapshot("ntop_health")
+        return jsonify(dict(stats, stale=stale))
     except Exception as e:
         app.logger.error(f"Failed to fetch ntop health stats: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/ntop/traffic")
 def api_ntop_traffic():
-    return jsonify(query_ntop_traffic())
+    traffic, stale = snapshot("ntop_traffic")
+    return jsonify(dict(traffic, stale=stale))
 
 
 @app.route('/goto/ntop')
@@ -378,30 +464,24 @@ def goto_suricata():
 
 @app.route("/api/suricata/alerts")
 def api_suricata_alerts():
-    alerts = read_suricata_eve(limit=50)
-    return jsonify({"alerts": alerts})
+    alerts, stale = snapshot("suricata_events")
+    return jsonify({"alerts": alerts[:50], "stale": stale})
 
 @app.route("/api/system/stats")
 def api_system_stats():
-    return jsonify(system_stats())
+    stats, stale = snapshot("system_stats")
+    return jsonify(dict(stats, stale=stale))
 
 # ---------- UI pages ----------
 @app.route("/")
 def ui_index():
-    # Get ntop system health stats
-    ntop_stats = get_system_health_stats(NTOP_URL)
-    
-    # Get system stats
-    sys_stats = system_stats()
-    
-    # Get network interface stats
-    interface_stats = get_network_interfaces(NTOP_URL)
-    
-    # Get active hosts data
-    hosts_data = get_active_hosts(NTOP_URL)
-    
-    # Get alerts
-    alerts = read_suricata_eve(limit=50)
+    # All of these come from the background refresher
+    ntop_stats, _ = snapshot("ntop_health")
+    sys_stats, _ = snapshot("system_stats")
+    interface_stats, _ = snapshot("interfaces")
+    hosts_data, _ = snapshot("hosts")
+    alerts, _ = snapshot("suricata_events")
+    alerts = alerts[:50]
     
     def format_bytes(bytes_value):
         if not bytes_value:
@@ -438,7 +518,7 @@ def ui_index():
 @app.route("/threat-management.html")
 def ui_threats():
     # Gather events from eve.json, alerts from fast.log, and stats
-    events = read_suricata_eve(limit=100)
+    events, _ = snapshot("suricata_events")
     fast_alerts = read_fast_log(limit=50)
     suri = read_suricata_stats()
     return render_template("threat-management.html", 
@@ -4,7 +4,9 @@ SUTMS Logging Engine – minimal version
 Collects logs from Suricata, ntop, and your Flask app into one file (/var/log/sutms/app.log).
 """
 
-import os, json, time, platform, requests, psutil, subprocess, logging
+import os, time, platform, psutil, subprocess, logging, threading
+import orjson
+from inotify_simple import INotify, flags
 from pythonjsonlogger import jsonlogger
 
 LOG_FILE = "/var/log/sutms/app.log"
@@ -12,6 +14,10 @@ SURICATA_EVE = "/var/log/suricata/eve.json"
 NTOP_BASE = "http://10.54.64.34:3000"   # change if your ntopng runs elsewhere
 NTOP_STATS = f"{NTOP_BASE}/lua/rest/v2/get/system/health/stats.lua"
 
+# one keep-alive connection reused by every poll; created on first use so
+# requests is only imported once the stats poller actually runs
+_ntop_session = None
+
 # ---------- setup logger ----------
 logger = logging.getLogger("sutms")
 logger.setLevel(logging.INFO)
@@ -41,38 +47,104 @@ def log_system_health():
     data = system_health()
     logger.info("system_health", extra={"source":"sutms","event":"system_health","payload":data})
 
-def log_suricata_alerts():
-    if not os.path.isfile(SURICATA_EVE): return
-    with open(SURICATA_EVE,"r") as f:
-        for line in f.readlines()[-10:]:  # last 10 alerts
-            try:
-                obj = json.loads(line)
-                if obj.get("event_type") == "alert":
-                    logger.info("suricata_alert", extra={
-                        "source":"suricata",
-                        "event":"alert",
-                        "payload":{
-                            "sig":obj.get("alert",{}).get("signature"),
-                            "src_ip":obj.get("src_ip"),
-                            "dest_ip":obj.get("dest_ip"),
-                            "severity":obj.get("alert",{}).get("severity")
-                        }})
-            except Exception:
-                continue
+def log_suricata_alerts(data):
+    """Log every alert record in a block of complete eve.json lines."""
+    for line in data.split(b"\n"):
+        try:
+            obj = orjson.loads(line)
+            if obj.get("event_type") == "alert":
+                logger.info("suricata_alert", extra={
+                    "source":"suricata",
+                    "event":"alert",
+                    "payload":{
+                        "sig":obj.get("alert",{}).get("signature"),
+                        "src_ip":obj.get("src_ip"),
+                        "dest_ip":obj.get("dest_ip"),
+                        "severity":obj.get("alert",{}).get("severity")
+                    }})
+        except Exception:
+            continue
+
+def open_eve(from_start):
+    """Open eve.json (waiting for it to exist) and watch it with inotify.
+
+    The directory is watched too: after an unlink-and-recreate rotation the
+    old inode stays open here, so DELETE_SELF never fires for it, but the
+    CREATE / MOVED_TO of the new eve.json does.
+    """
+    while not os.path.isfile(SURICATA_EVE):
+        time.sleep(5)
+    notifier = INotify()
+    notifier.add_watch(SURICATA_EVE, flags.MODIFY | flags.ATTRIB | flags.MOVE_SELF | flags.DELETE_SELF)
+    notifier.add_watch(os.path.dirname(SURICATA_EVE), flags.CREATE | flags.MOVED_TO)
+    f = open(SURICATA_EVE, "rb")
+    if not from_start:
+        f.seek(0, os.SEEK_END)
+    return notifier, f
+
+def eve_rotated(events):
+    """True if events show eve.json being moved, deleted or replaced."""
+    name = os.path.basename(SURICATA_EVE)
+    return any(ev.mask & (flags.MOVE_SELF | flags.DELETE_SELF)
+               or (ev.name == name and ev.mask & (flags.CREATE | flags.MOVED_TO))
+               for ev in events)
+
+def follow_suricata_alerts():
+    """Log new Suricata alerts as eve.json grows; never returns.
+
+    Blocks on inotify, so nothing is read while Suricata is idle, and each
+    wakeup only parses the bytes appended since the previous one.
+    """
+    notifier, f = open_eve(from_start=False)
+    pending = b""  # trailing line Suricata has not finished writing yet
+    rotated = False
+    while True:
+        st = os.fstat(f.fileno())
+        if st.st_size < f.tell():
+            # truncated in place (copytruncate)
+            f.seek(0)
+            pending = b""
+        data = pending + f.read()
+        end = data.rfind(b"\n") + 1
+        log_suricata_alerts(data[:end])
+        pending = data[end:]
+        # st_nlink == 0: unlinked (ATTRIB wakes us when the link count drops)
+        if rotated or st.st_nlink == 0:
+            # old file fully drained above; continue with the new one from
+            # its start, reading what is already there before blocking again
+            f.close()
+            notifier.close()
+            notifier, f = open_eve(from_start=True)
+            pending = b""
+            rotated = False
+            continue
+        rotated = eve_rotated(notifier.read())
+
+def ntop_session():
+    global _ntop_session
+    if _ntop_session is None:
+        import requests
+        _ntop_session = requests.Session()
+    return _ntop_session
 
 def log_ntop_stats():
     try:
-        r = requests.get(NTOP_STATS, timeout=4)
+        r = ntop_session().get(NTOP_STATS, timeout=4)
         r.raise_for_status()
         j = r.json()
         logger.info("ntop_stats", extra={"source":"ntop","event":"system_stats","payload":j.get("rsp",{})})
     except Exception as e:
         logger.warning("ntop_fetch_fail", extra={"source":"ntop","event":"error","payload":{"error":str(e)}})
 
+def poll_stats():
+    """Log system health and ntop stats, then reschedule itself in 60 s."""
+    log_system_health()
+    log_ntop_stats()
+    timer = threading.Timer(60, poll_stats)  # every minute
+    timer.daemon = True
+    timer.start()
+
 if __name__ == "__main__":
     print("[+] SUTMS Logging Engine started. Writing logs to", LOG_FILE)
-    while True:
-        log_system_health()
-        log_suricata_alerts()
-        log_ntop_stats()
-        time.sleep(60)  # every minute
+    poll_stats()
+    follow_suricata_alerts()
@@ -1,17 +1,70 @@
-import requests
+import random
 import time
+import requests
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional; json.loads also accepts bytes
+    from json import loads as json_loads
+
 class NtopFetchError(Exception):
     pass
 
+def _i(v) -> int:
+    """ntopng counters are JSON ints already; only coerce other types (str, float, None)."""
+    return v if type(v) is int else int(v or 0)
+
+MAX_BACKOFF = 4.0  # seconds
+
+@lru_cache(maxsize=None)
+def _session() -> requests.Session:
+    """
+    Keep-alive session, so repeated polls reuse one pooled connection to
+    ntopng. Retries are done by _get_payload so they can honour a deadline.
+    """
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+def _get_payload(url: str, headers: Dict[str, str], timeout: float, retries: int,
+                 backoff: float, deadline: float) -> Any:
+    """
+    GET url and decode the JSON body, retrying transport errors and 5xx.
+
+    `retries` counts total attempts. Backoff is exponential, capped at
+    MAX_BACKOFF and jittered so pollers don't retry against a struggling
+    ntopng in lockstep; no retry is started once the next sleep would take
+    the whole call past `deadline` seconds.
+    """
+    started = time.monotonic()
+    for attempt in range(1, retries + 1):
+        try:
+            resp = _session().get(url, headers=headers, timeout=timeout)
+            resp.raise_for_status()
+            return json_loads(resp.content)
+        except requests.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            if attempt >= retries or (status is not None and status < 500):
+                raise
+            delay = min(MAX_BACKOFF, backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if time.monotonic() - started + delay > deadline:
+                raise
+            time.sleep(delay)
+
 def fetch_ntop_system_stats(
     base_url: str,
     timeout: float = 5.0,
     api_key: Optional[str] = None,
     retries: int = 3,
-    backoff: float = 0.5
+    backoff: float = 0.5,
+    deadline: Optional[float] = None
 ) -> Dict[str, Any]:
     """
     Fetch and normalise ntopng system health stats from:
@@ -51,6 +104,9 @@ def fetch_ntop_system_stats(
         }
       }
 
+    `deadline` caps the seconds spent across all attempts and backoff sleeps
+    (default: timeout * retries).
+
     Raises:
       NtopFetchError on network/format errors.
     """
@@ -61,91 +117,83 @@ def fetch_ntop_system_stats(
     headers = {}
     if api_key:
         headers["X-API-Key"] = api_key
+    if deadline is None:
+        deadline = timeout * retries
+
+    try:
+        payload = _get_payload(url, headers, timeout, retries, backoff, deadline)
+        # assert rc==0 or rc_str
+        if not isinstance(payload, dict) or "rc" not in payload or "rsp" not in payload:
+            raise NtopFetchError("Unexpected response format from ntopng")
+        rsp = payload.get("rsp", {})
+
+        # Basic fields
+        epoch = rsp.get("epoch")
+        epoch = _i(epoch) if epoch is not None else None
+        timestamp = datetime.fromtimestamp(epoch, tz=timezone.utc) if epoch else None
+        cpu_load = float(rsp.get("cpu_load")) if rsp.get("cpu_load") is not None else None
+
+        # Memory normalisation (ntop returns small integers — assume bytes already)
+        mem = {
+            "total": _i(rsp.get("mem_total")),
+            "used": _i(rsp.get("mem_used")),
+            "free": _i(rsp.get("mem_free")),
+            "cached": _i(rsp.get("mem_cached")),
+            "buffers": _i(rsp.get("mem_buffers")),
+            "shmem": _i(rsp.get("mem_shmem")),
+        }
 
-    last_exc = None
-    for attempt in range(1, retries + 1):
-        try:
-            resp = requests.get(url, headers=headers, timeout=timeout)
-            resp.raise_for_status()
-            payload = resp.json()
-            # assert rc==0 or rc_str
-            if not isinstance(payload, dict) or "rc" not in payload or "rsp" not in payload:
-                raise NtopFetchError("Unexpected response format from ntopng")
-            rsp = payload.get("rsp", {})
-
-            # Basic fields
-            epoch = int(rsp.get("epoch")) if rsp.get("epoch") is not None else None
-            timestamp = datetime.fromtimestamp(epoch, tz=timezone.utc) if epoch else None
-            cpu_load = float(rsp.get("cpu_load")) if rsp.get("cpu_load") is not None else None
-
-            # Memory normalisation (ntop returns small integers — assume bytes already)
-            mem = {
-                "total": int(rsp.get("mem_total", 0)),
-                "used": int(rsp.get("mem_used", 0)),
-                "free": int(rsp.get("mem_free", 0)),
-                "cached": int(rsp.get("mem_cached", 0)),
-                "buffers": int(rsp.get("mem_buffers", 0)),
-                "shmem": int(rsp.get("mem_shmem", 0)),
-            }
-
-            ntopng_mem = {
-                "resident": int(rsp.get("mem_ntopng_resident", 0)),
-                "virtual": int(rsp.get("mem_ntopng_virtual", 0)),
-            }
-
-            # Storage block
-            storage_raw = rsp.get("storage", {}) or {}
-            storage = {
-                "total": int(storage_raw.get("total", 0)),
-                "volume_size": int(storage_raw.get("volume_size", 0)),
-                "volume_dev": storage_raw.get("volume_dev"),
-                "other": int(storage_raw.get("other", 0)),
-                "pcap_total": int(storage_raw.get("pcap_total", 0)),
-                "interfaces": []
-            }
-            # interfaces may be a list with null first element per example
-            for iface in storage_raw.get("interfaces", []) or []:
-                if not iface:
-                    continue
-                storage["interfaces"].append({
-                    "name": iface.get("name"),
-                    "total": int(iface.get("total", 0)),
-                    "pcap": int(iface.get("pcap", 0)),
-                    "rrd": int(iface.get("rrd", 0))
-                })
-
-            alerts = {
-                "queries": int(rsp.get("alerts_queries", 0)),
-                "written": int(rsp.get("written_alerts", 0)),
-                "dropped": int(rsp.get("dropped_alerts", 0)),
-                "stats": rsp.get("alerts_stats", {})
-            }
-
-            cpu_states = rsp.get("cpu_states", {})
-
-            result = {
-                "raw": payload,
-                "epoch": epoch,
-                "timestamp": timestamp,
-                "cpu_load": cpu_load,
-                "cpu_states": cpu_states,
-                "mem": mem,
-                "ntopng_mem": ntopng_mem,
-                "storage": storage,
-                "alerts": alerts
-            }
-            return result
-
-        except (requests.RequestException, ValueError) as e:
-            last_exc = e
-            # simple backoff
-            if attempt < retries:
-                time.sleep(backoff * attempt)
+        ntopng_mem = {
+            "resident": _i(rsp.get("mem_ntopng_resident")),
+            "virtual": _i(rsp.get("mem_ntopng_virtual")),
+        }
+
+        # Storage block
+        storage_raw = rsp.get("storage", {}) or {}
+        storage = {
+            "total": _i(storage_raw.get("total")),
+            "volume_size": _i(storage_raw.get("volume_size")),
+            "volume_dev": storage_raw.get("volume_dev"),
+            "other": _i(storage_raw.get("other")),
+            "pcap_total": _i(storage_raw.get("pcap_total")),
+            "interfaces": []
+        }
+        # interfaces may be a list with null first element per example
+        _g = dict.get  # avoids a bound-method lookup per field
+        for iface in storage_raw.get("interfaces") or ():
+            if not iface:
                 continue
-            raise NtopFetchError(f"Failed to fetch ntop stats: {e}") from e
+            storage["interfaces"].append({
+                "name": _g(iface, "name"),
+                "total": _i(_g(iface, "total")),
+                "pcap": _i(_g(iface, "pcap")),
+                "rrd": _i(_g(iface, "rrd"))
+            })
+
+        alerts = {
+            "queries": _i(rsp.get("alerts_queries")),
+            "written": _i(rsp.get("written_alerts")),
+            "dropped": _i(rsp.get("dropped_alerts")),
+            "stats": rsp.get("alerts_stats", {})
+        }
+
+        cpu_states = rsp.get("cpu_states", {})
+
+        result = {
+            "raw": payload,
+            "epoch": epoch,
+            "timestamp": timestamp,
+            "cpu_load": cpu_load,
+            "cpu_states": cpu_states,
+            "mem": mem,
+            "ntopng_mem": ntopng_mem,
+            "storage": storage,
+            "alerts": alerts
+        }
+        return result
 
-    # if fallthrough
-    raise NtopFetchError(f"Failed to fetch ntop stats, last error: {last_exc}")
+    except (requests.RequestException, ValueError) as e:
+        raise NtopFetchError(f"Failed to fetch ntop stats: {e}") from e
 
 # ----------------------------
 # Example usage:
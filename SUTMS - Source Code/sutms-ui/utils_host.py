@@ -1,12 +1,106 @@
+import logging
 import requests
-import urllib3
 
-NTOP_USER = "admin"
-NTOP_PASS = "ntopng"
+from utils_ntop import get_client, json_loads
 
+try:
+    import ijson
+except ImportError:  # optional; large payloads are then decoded in one go
+    ijson = None
+
+try:
+    import numpy as np
+except ImportError:  # optional; get_active_hosts_soa then returns plain lists
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Responses above this size are stream-parsed with ijson when it is installed
+STREAM_THRESHOLD = 512 * 1024
+
+# Fixed schema of a flattened host row, in column order
+_HOST_KEYS = (
+    "ip", "name", "mac", "country",
+    "bytes_received", "bytes_sent", "total_bytes",
+    "throughput_bps", "throughput_pps",
+    "flows", "score",
+    "is_localhost", "is_blacklisted", "last_seen",
+)
+
+# Columns converted to float64 arrays by get_active_hosts_soa when numpy is present
+_NUMERIC_HOST_KEYS = (
+    "bytes_received", "bytes_sent", "total_bytes",
+    "throughput_bps", "throughput_pps", "flows", "score",
+)
+
+def _row(host):
+    """Flatten one ntopng host entry; nested dicts are looked up once each.
+
+    Keys are _HOST_KEYS. They stay a constant-key dict literal, which CPython
+    builds in a single BUILD_CONST_KEY_MAP; dict(zip(_HOST_KEYS, values))
+    measured about twice as slow.
+    """
+    get = host.get
+    traffic = get("bytes") or {}
+    thpt = get("thpt") or {}
+    return {
+        "ip": get("ip"),
+        "name": get("name"),
+        "mac": get("mac"),
+        "country": get("country"),
+        "bytes_received": traffic.get("recvd"),
+        "bytes_sent": traffic.get("sent"),
+        "total_bytes": traffic.get("total"),
+        "throughput_bps": thpt.get("bps"),
+        "throughput_pps": thpt.get("pps"),
+        "flows": (get("num_flows") or {}).get("total"),
+        "score": (get("score") or {}).get("total"),
+        "is_localhost": get("is_localhost"),
+        "is_blacklisted": get("is_blacklisted"),
+        "last_seen": get("last_seen"),
+    }
+
+def parse_active_hosts(data, interface_id):
+    """Build the active host list from a decoded ntopng host/active.lua payload."""
+    if data.get("rc") != 0 or "rsp" not in data:
+        logger.warning("Unexpected ntopng response structure (rc=%r)", data.get("rc"))
+        return {"error": "Invalid or incomplete response"}
+
+    host_entries = data["rsp"].get("data", [])
+    hosts = [_row(host) for host in host_entries]
+
+    return {"interface_id": interface_id, "active_hosts": hosts}
+
+
+def stream_active_hosts(response, interface_id):
+    """
+    Like parse_active_hosts, but builds each host straight off the socket.
+
+    Only one host object is materialized at a time, instead of the whole
+    decoded payload plus the flattened list.
+    """
+    rc = None
+    hosts = []
+    builder = None
+    response.raw.decode_content = True  # undo gzip/deflate transfer encoding
+    for prefix, event, value in ijson.parse(response.raw, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "rsp.data.item" and event == "end_map":
+                hosts.append(_row(builder.value))
+                builder = None
+        elif prefix == "rsp.data.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == "rc":
+            rc = value
+
+    if rc != 0:
+        logger.warning("Unexpected ntopng response structure (rc=%r)", rc)
+        return {"error": "Invalid or incomplete response"}
+
+    return {"interface_id": interface_id, "active_hosts": hosts}
 
-# Disable SSL warnings for self-signed certificates (optional)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 def get_active_hosts(base_url="http://127.0.0.1:3000", interface_id=2, token=None):
     """
@@ -20,53 +114,60 @@ def get_active_hosts(base_url="http://127.0.0.1:3000", interface_id=2, token=Non
     Returns:
         dict: Dictionary containing active host metrics.
     """
-    endpoint = f"{base_url}/lua/rest/v2/get/host/active.lua?ifid=2"
-    headers = {}
+    # ntopng commonly runs with a self-signed certificate
+    client = get_client(base_url, verify=False)
+    try:
+        with client.get("/lua/rest/v2/get/host/active.lua", params={"ifid": interface_id},
+                        token=token, timeout=15, stream=True) as response:
+            response.raise_for_status()
 
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+            if ijson is not None and int(response.headers.get("Content-Length") or 0) > STREAM_THRESHOLD:
+                try:
+                    return stream_active_hosts(response, interface_id)
+                except ijson.JSONError:
+                    logger.debug("Invalid JSON in streamed host/active.lua response")
+                    return {"error": "Invalid JSON response"}
 
-    try:
-        response = requests.get(endpoint,  auth=(NTOP_USER, NTOP_PASS), headers=headers, timeout=15, verify=False)
-        response.raise_for_status()
-
-        try:
-            data = response.json()
-        except ValueError:
-            print("⚠️ Invalid JSON response. Raw output:\n", response.text[:1000])
-            return {"error": "Invalid JSON response"}
-
-        if data.get("rc") != 0 or "rsp" not in data:
-            print("⚠️ Unexpected response structure:", data)
-            return {"error": "Invalid or incomplete response"}
-
-        host_entries = data["rsp"].get("data", [])
-        hosts = []
-
-        for host in host_entries:
-            hosts.append({
-                "ip": host.get("ip"),
-                "name": host.get("name"),
-                "mac": host.get("mac"),
-                "country": host.get("country"),
-                "bytes_received": host.get("bytes", {}).get("recvd"),
-                "bytes_sent": host.get("bytes", {}).get("sent"),
-                "total_bytes": host.get("bytes", {}).get("total"),
-                "throughput_bps": host.get("thpt", {}).get("bps"),
-                "throughput_pps": host.get("thpt", {}).get("pps"),
-                "flows": host.get("num_flows", {}).get("total"),
-                "score": host.get("score", {}).get("total"),
-                "is_localhost": host.get("is_localhost"),
-                "is_blacklisted": host.get("is_blacklisted"),
-                "last_seen": host.get("last_seen"),
-            })
-
-        return {"interface_id": interface_id, "active_hosts": hosts}
+            # one growing buffer instead of response.content's chunk list + join
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                body += chunk
+            try:
+                data = json_loads(body)
+            except ValueError:
+                logger.debug("Invalid JSON response (first 256 bytes): %r", bytes(body[:256]))
+                return {"error": "Invalid JSON response"}
+
+        return parse_active_hosts(data, interface_id)
 
     except requests.RequestException as e:
         return {"error": f"Request failed: {e}"}
 
 
+def get_active_hosts_soa(base_url="http://127.0.0.1:3000", interface_id=2, token=None):
+    """
+    Fetch active hosts column-wise, for aggregation (sums, sorts, filters).
+
+    Returns:
+        dict: {"interface_id", "count", "columns": {key: column}} with one
+              column per _HOST_KEYS entry. Numeric columns are float64 numpy
+              arrays (missing values as 0) when numpy is installed, otherwise
+              every column is a list. Errors are passed through as in
+              get_active_hosts.
+    """
+    result = get_active_hosts(base_url, interface_id, token)
+    if "error" in result:
+        return result
+
+    rows = result["active_hosts"]
+    columns = {key: [row[key] for row in rows] for key in _HOST_KEYS}
+    if np is not None:
+        for key in _NUMERIC_HOST_KEYS:
+            columns[key] = np.fromiter((v or 0 for v in columns[key]), dtype=np.float64, count=len(rows))
+
+    return {"interface_id": interface_id, "count": len(rows), "columns": columns}
+
+
 if __name__ == "__main__":
     result = get_active_hosts()
     print(result)
@@ -1,7 +1,34 @@
+import logging
+import time
 import requests
 
-NTOP_USER = "admin"
-NTOP_PASS = "ntopng"
+from utils_ntop import get_client, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Interfaces rarely change, so a result is reused for _TTL seconds and kept
+# as a stale fallback if ntopng stops answering
+_TTL = 30.0
+_IFACE_CACHE = {"t": 0.0, "key": None, "v": None}
+
+def parse_network_interfaces(data):
+    """Build the interface list from a decoded ntopng interfaces.lua payload."""
+    if data.get("rc") != 0 or "rsp" not in data:
+        logger.warning("Unexpected ntopng response structure (rc=%r)", data.get("rc"))
+        return {"error": "Invalid or incomplete response"}
+
+    interfaces = []
+    for iface in data["rsp"]:
+        interfaces.append({
+            "interface_id": iface.get("ifid"),
+            "name": iface.get("name"),
+            "is_pcap": iface.get("is_pcap_interface"),
+            "is_packet": iface.get("is_packet_interface"),
+            "is_zmq": iface.get("is_zmq_interface"),
+        })
+
+    return {"interfaces": interfaces}
+
 
 def get_network_interfaces(base_url="http://127.0.0.1:3000", token=None):
     """
@@ -12,42 +39,33 @@ def get_network_interfaces(base_url="http://127.0.0.1:3000", token=None):
         token (str): Optional API token if authentication is required.
     
     Returns:
-        dict: Dictionary containing a list of network interface details.
+        dict: Dictionary containing a list of network interface details
+              (with "stale": True when ntopng is unreachable and a previous
+              result is returned instead).
     """
-    endpoint = f"{base_url}/lua/rest/v2/get/ntopng/interfaces.lua"
-    headers = {}
-
-    # Add auth token if required
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
+    now = time.monotonic()
+    key = (base_url, token)
+    if _IFACE_CACHE["key"] == key and now - _IFACE_CACHE["t"] < _TTL:
+        return _IFACE_CACHE["v"]
 
     try:
-        response = requests.get(endpoint, auth=(NTOP_USER, NTOP_PASS), headers=headers, timeout=10)
+        response = get_client(base_url).get("/lua/rest/v2/get/ntopng/interfaces.lua", token=token, timeout=10)
         response.raise_for_status()
 
         try:
-            data = response.json()
+            data = json_loads(response.content)
         except ValueError:
-            print("⚠️ Invalid JSON response. Raw output:\n", response.text[:1000])
+            logger.debug("Invalid JSON response (first 256 bytes): %r", response.content[:256])
             return {"error": "Invalid JSON response"}
 
-        if data.get("rc") != 0 or "rsp" not in data:
-            print("⚠️ Unexpected response structure:", data)
-            return {"error": "Invalid or incomplete response"}
-
-        interfaces = []
-        for iface in data["rsp"]:
-            interfaces.append({
-                "interface_id": iface.get("ifid"),
-                "name": iface.get("name"),
-                "is_pcap": iface.get("is_pcap_interface"),
-                "is_packet": iface.get("is_packet_interface"),
-                "is_zmq": iface.get("is_zmq_interface"),
-            })
-
-        return {"interfaces": interfaces}
+        result = parse_network_interfaces(data)
+        if "error" not in result:
+            _IFACE_CACHE.update(t=now, key=key, v=result)
+        return result
 
     except requests.RequestException as e:
+        if _IFACE_CACHE["key"] == key:
+            return dict(_IFACE_CACHE["v"], stale=True)
         return {"error": f"Request failed: {e}"}
 
 
@@ -2,80 +2,119 @@
 Utility functions for reading and parsing Suricata log files.
 """
 import os
+import re
 import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def tail_lines(path, max_lines=None, block_size=65536, end=None):
+    """Yield the lines of a file last-to-first without reading the whole file.
+
+    The file is read backwards in block_size chunks with seek/read, so only
+    the tail is touched. It is not memory-mapped: logrotate's copytruncate can
+    shrink the file mid-scan, which turns an mmap access into SIGBUS, whereas
+    a short read just ends the scan. Lines are bytes without the trailing
+    newline (blank lines included). `end` is the byte offset to start from
+    (default: current end of file).
+    """
+    with open(path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        pos = end
+        carry = b''
+        count = 0
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            fh.seek(pos)
+            block = fh.read(step)
+            if len(block) < step:
+                return  # truncated while scanning
+            lines = (block + carry).split(b'\n')
+            # the first piece may be the end of a line that starts in an earlier block
+            carry = lines[0]
+            for line in reversed(lines[1:]):
+                yield line
+                count += 1
+                if max_lines is not None and count >= max_lines:
+                    return
+        if carry:
+            yield carry
+
+# fast.log: timestamp  [**] [gid:sid:rev] description [**] [Classification: name] [Priority: n] {proto} src:port -> dst:port
+_FAST_RE = re.compile(
+    r'^(?P<ts>\S+)\s+\[\*\*\]\s+\[(?P<id>[^\]]+)\]\s+(?P<desc>.*?)\s*\[\*\*\]\s+'
+    r'(?:\[Classification:\s*(?P<cls>[^\]]*?)\s*\]\s+)?\[Priority:\s*(?P<pri>\d+)\]\s+'
+    r'\{(?P<proto>[^}]+)\}\s+(?P<src>\S+)\s+->\s+(?P<dst>\S+)'
+)
 
 def read_fast_log(log_path="/var/log/suricata/fast.log", limit=50):
     """Read and parse Suricata fast.log alerts."""
     alerts = []
     try:
         if os.path.isfile(log_path):
-            with open(log_path, 'r') as f:
-                # Read last N lines
-                lines = f.readlines()[-limit:]
-                for line in lines:
-                    try:
-                        # Fast.log format: timestamp  [**] [id] description [**] [Classification: name] [Priority: n] {proto} src:port -> dst:port
-                        parts = line.split('[**]')
-                        if len(parts) < 2:
-                            continue
-                        
-                        timestamp = parts[0].strip()
-                        alert_parts = parts[1].split(']')
-                        
-                        # Extract alert ID and description
-                        alert_id = alert_parts[0].replace('[', '').strip()
-                        description = alert_parts[1].replace('[', '').strip()
-                        
-                        # Extract classification and priority
-                        class_priority = parts[2].split(']')
-                        classification = class_priority[0].replace('[Classification:', '').strip()
-                        priority = class_priority[1].replace('[Priority:', '').replace(']', '').strip()
-                        
-                        # Extract protocol and IPs
-                        traffic = parts[2].split('}')[-1].strip()
-                        src_dst = traffic.split('->')
-                        
-                        alerts.append({
-                            'timestamp': timestamp,
-                            'id': alert_id,
-                            'description': description,
-                            'classification': classification,
-                            'priority': int(priority),
-                            'source': src_dst[0].strip() if len(src_dst) > 0 else 'unknown',
-                            'destination': src_dst[1].strip() if len(src_dst) > 1 else 'unknown'
-                        })
-                    except Exception:
-                        continue
-    except Exception as e:
-        print(f"Error reading fast.log: {e}")
+            # Read last N lines from the end of the file only
+            lines = list(tail_lines(log_path, max_lines=limit + 1))
+            if lines and not lines[0]:
+                lines.pop(0)  # empty piece after the final newline
+            for raw in reversed(lines[:limit]):
+                line = raw.decode('utf-8', 'replace')
+                m = _FAST_RE.match(line)
+                if m is None:
+                    continue
+                # pri is \d+ in the pattern, so int() cannot raise here
+                alerts.append({
+                    'timestamp': m.group('ts'),
+                    'id': m.group('id'),
+                    'description': m.group('desc'),
+                    'classification': m.group('cls') or '',
+                    'priority': int(m.group('pri')),
+                    'source': m.group('src'),
+                    'destination': m.group('dst')
+                })
+    except (OSError, ValueError) as e:
+        logger.warning("Error reading fast.log %s: %s", log_path, e)
     
     return alerts
 
-def categorize_event(event):
-    """Categorize a Suricata event based on its type and severity."""
-    event_type = event.get('event_type', '')
-    
+# Flow states that count as ordinary traffic
+_NORMAL_FLOW_STATES = frozenset(('new', 'established'))
+
+def _categorize_alert(event):
     # For alert events, check severity
-    if event_type == 'alert':
-        severity = event.get('alert', {}).get('severity', 0)
-        if severity >= 3:
-            return 'high-risk'
-        elif severity >= 2:
-            return 'medium-risk'
-        return 'low-risk'
-    
-    # For flow events
-    elif event_type == 'flow':
-        state = event.get('flow', {}).get('state', '')
-        if state in ['new', 'established']:
-            return 'normal'
-        return 'suspicious'
-    
-    # For DNS events
-    elif event_type == 'dns':
-        if event.get('dns', {}).get('rcode') == 'NXDOMAIN':
-            return 'warning'
+    severity = event.get('alert', {}).get('severity', 0)
+    if severity >= 3:
+        return 'high-risk'
+    elif severity >= 2:
+        return 'medium-risk'
+    return 'low-risk'
+
+def _categorize_flow(event):
+    if event.get('flow', {}).get('state', '') in _NORMAL_FLOW_STATES:
         return 'normal'
-    
-    # Default case
-    return 'normal'
\ No newline at end of file
+    return 'suspicious'
+
+def _categorize_dns(event):
+    if event.get('dns', {}).get('rcode') == 'NXDOMAIN':
+        return 'warning'
+    return 'normal'
+
+def _categorize_default(event):
+    return 'normal'
+
+_CATEGORIZERS = {
+    'alert': _categorize_alert,
+    'flow': _categorize_flow,
+    'dns': _categorize_dns,
+}
+
+def categorize_event(event):
+    """Categorize a Suricata event based on its type and severity."""
+    return _CATEGORIZERS.get(event.get('event_type', ''), _categorize_default)(event)
+
+def categorize_events(events):
+    """Categorize a batch of Suricata events; same results as categorize_event per item."""
+    lookup = _CATEGORIZERS.get
+    return [lookup(e.get('event_type', ''), _categorize_default)(e) for e in events]
@@ -0,0 +1,66 @@
+"""
+Shared ntopng REST client used by the utils_* fetchers.
+"""
+import os
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # optional; json.loads also accepts bytes
+    from json import loads as json_loads
+
+
+def default_auth():
+    """ntopng credentials from NTOP_USER / NTOP_PASS (ntopng's defaults otherwise)."""
+    return os.environ.get("NTOP_USER", "admin"), os.environ.get("NTOP_PASS", "ntopng")
+
+
+class NtopClient:
+    """
+    Keep-alive, retrying session to one ntopng instance.
+
+    Args:
+        base_url (str): Base URL of the ntopng instance.
+        user, password (str): Override the NTOP_USER / NTOP_PASS credentials.
+        verify (bool): Verify TLS certificates; when False the urllib3
+            InsecureRequestWarning is silenced as well.
+    """
+
+    def __init__(self, base_url, user=None, password=None, verify=True):
+        self.base_url = base_url.rstrip("/")
+        env_user, env_pass = default_auth()
+        self.session = requests.Session()
+        self.session.auth = (user or env_user, password or env_pass)
+        self.session.verify = verify
+        if not verify:
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504)),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path, params=None, token=None, timeout=10, **kwargs):
+        """GET base_url + path; `token` adds a Bearer Authorization header."""
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        return self.session.get(self.base_url + path, params=params, headers=headers,
+                                timeout=timeout, **kwargs)
+
+    def get_json(self, path, params=None, token=None, timeout=10):
+        """GET and decode a JSON body; raises requests.RequestException or ValueError."""
+        response = self.get(path, params=params, token=token, timeout=timeout)
+        response.raise_for_status()
+        return json_loads(response.content)
+
+
+@lru_cache(maxsize=None)
+def get_client(base_url, verify=True):
+    """The shared NtopClient for base_url, so every caller reuses its connections."""
+    return NtopClient(base_url, verify=verify)